@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""Smoke-test the rust-mcp server handshake over stdio or HTTP.
+
+Drives the minimal MCP flow (initialize -> initialized -> tools/list) against
+either a built binary (stdio transport) or a running server (Streamable HTTP)
+and fails loudly if the handshake breaks or no tools are advertised.
+
+Usage:
+    python3 scripts/mcp_smoke_test.py stdio rust-mcp/target/release/rust-mcp
+    python3 scripts/mcp_smoke_test.py http --url http://127.0.0.1:8787/mcp
+
+Requires: msgspec, httpx[http2]
+"""
+
+import argparse
+import asyncio
+import functools
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Optional
+
+import httpx
+import msgspec
+
+PROTOCOL_VERSION = "2025-03-26"
+CLIENT_INFO = {"name": "mcp-smoke-test", "version": "0.1.0"}
+
+
+def eprint(*args: Any) -> None:
+    print(*args, file=sys.stderr)
+
+
+# Matches one dotenv assignment: optional `export`, key, then a double-quoted,
+# single-quoted, or bare value (bare values stop at an inline comment). Blank
+# and comment lines simply fail to match.
+_ENV_RE = re.compile(
+    rb"^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_]*)\s*=\s*"
+    rb"(?:\"([^\"]*)\"|'([^']*)'|([^\n#]*?))\s*(?:#.*)?$"
+)
+
+
+def read_env_file(path: str) -> dict:
+    """Parse a dotenv-style file (KEY=VALUE, # comments, optional quotes)."""
+    env = {}
+    with open(path, "rb") as f:
+        for raw in f:
+            m = _ENV_RE.match(raw)
+            if not m:
+                continue
+            value = next(g for g in m.group(2, 3, 4) if g is not None)
+            env[m.group(1).decode()] = value.decode()
+    return env
+
+
+# Response structs carry only the fields the script reads (jsonrpc is never
+# looked at, so it isn't even decoded) and opt out of GC tracking — they're
+# acyclic and short-lived, so allocation stays as cheap as a bare tuple.
+class JsonRpcResponse(msgspec.Struct, gc=False):
+    id: Any = None
+    result: Any = None
+    error: Any = None
+
+
+class JsonRpcId(msgspec.Struct, gc=False):
+    id: Any = None
+
+
+class Tool(msgspec.Struct, gc=False):
+    name: str = ""
+
+
+class ToolsResult(msgspec.Struct, gc=False):
+    tools: list[Tool] = []
+
+
+class ToolsListResponse(msgspec.Struct, gc=False):
+    id: Any = None
+    result: Optional[ToolsResult] = None
+    error: Any = None
+
+
+# Cached codec instances: parsing lands directly in the final struct with no
+# intermediate dict, and the encoder skips per-call setup. The tools/list
+# decoder types the reply all the way down, so tool names come out as plain
+# attribute accesses instead of per-element dict lookups.
+_DECODER = msgspec.json.Decoder(JsonRpcResponse)
+_TOOLS_DECODER = msgspec.json.Decoder(ToolsListResponse)
+# Probe decoder: pulls just the id out of a reply so the dispatcher can pick
+# the right typed decoder without a full generic parse.
+_ID_DECODER = msgspec.json.Decoder(JsonRpcId)
+_ENCODER = msgspec.json.Encoder()
+
+
+# The handshake payloads are constant apart from their ids, so encode them
+# once at import; the hot send path is then a pure write with no JSON work.
+_INIT_BYTES = _ENCODER.encode(
+    {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "initialize",
+        "params": {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": CLIENT_INFO,
+        },
+    }
+)
+_INITIALIZED_BYTES = _ENCODER.encode({"jsonrpc": "2.0", "method": "initialized"})
+_TOOLS_LIST_BYTES = _ENCODER.encode(
+    {"jsonrpc": "2.0", "id": 2, "method": "tools/list", "params": {}}
+)
+_PROMPTS_LIST_BYTES = _ENCODER.encode(
+    {"jsonrpc": "2.0", "id": 3, "method": "prompts/list", "params": {}}
+)
+_SHUTDOWN_BYTES = _ENCODER.encode({"jsonrpc": "2.0", "id": 4, "method": "shutdown"})
+_EXIT_BYTES = _ENCODER.encode({"jsonrpc": "2.0", "method": "exit"})
+
+
+async def http_post(
+    client: httpx.AsyncClient,
+    url: str,
+    body: Optional[dict],
+    headers: dict,
+    data: Optional[bytes] = None,
+) -> tuple:
+    """POST a JSON-RPC body; return (status, lowercase-header dict, body bytes).
+
+    Pass pre-encoded bytes as `data` to skip the per-call encode. The body
+    comes back as r.content so replies feed the msgspec decoders without a
+    str round-trip; only error paths should decode it for display.
+    """
+    r = await client.post(
+        url, content=data if data is not None else _ENCODER.encode(body), headers=headers
+    )
+    return (
+        r.status_code,
+        {k.lower(): v for k, v in r.headers.items()},
+        r.content,
+    )
+
+
+async def stdio_roundtrip(
+    bin_path: str, env_file: Optional[str], timeout_s: float
+) -> list:
+    """Handshake against `bin_path --transport stdio`; return advertised tool names.
+
+    Uses asyncio subprocess streams: readline() wakes the moment the server
+    writes a reply instead of the old 10ms sleep-poll loop.
+    """
+    env = dict(os.environ)
+    if env_file:
+        env.update(read_env_file(env_file))
+
+    p = await asyncio.create_subprocess_exec(
+        bin_path,
+        "--transport",
+        "stdio",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env,
+    )
+
+    def send_raw(b: bytes) -> None:
+        # One buffer, one write: payload and newline framed together.
+        p.stdin.write(b + b"\n")
+
+    def deadline_ns() -> int:
+        return time.monotonic_ns() + int(timeout_s * 1e9)
+
+    # Replies are matched to requests by id through this map, so requests can
+    # be fired back-to-back and drained in whatever order the server answers.
+    pending: dict = {}
+    loop = asyncio.get_running_loop()
+
+    def expect(rid, decoder) -> asyncio.Future:
+        fut = loop.create_future()
+        pending[rid] = (fut, decoder)
+        return fut
+
+    async def reader() -> None:
+        while True:
+            line = await p.stdout.readline()
+            if not line:
+                break
+            # Raw bytes go straight into the msgspec decoders; the id probe
+            # picks the typed decoder registered for this request.
+            line = line.rstrip(b"\r\n")
+            entry = pending.pop(_ID_DECODER.decode(line).id, None)
+            if entry is None:
+                continue
+            fut, decoder = entry
+            if not fut.done():
+                fut.set_result(decoder.decode(line))
+        closed = RuntimeError("server closed stdout before replying")
+        for fut, _ in pending.values():
+            if not fut.done():
+                fut.set_exception(closed)
+        pending.clear()
+
+    async def wait_reply(fut: asyncio.Future, deadline: int):
+        # Monotonic integer deadlines: immune to wall-clock jumps and cheaper
+        # to compare than float time.time() arithmetic.
+        try:
+            return await asyncio.wait_for(
+                fut, timeout=(deadline - time.monotonic_ns()) / 1e9
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"no reply from server within {timeout_s}s") from None
+
+    reader_task = asyncio.ensure_future(reader())
+    failed = False
+    try:
+        init_fut = expect(1, _DECODER)
+        send_raw(_INIT_BYTES)
+        await p.stdin.drain()
+        init = await wait_reply(init_fut, deadline_ns())
+        if init.error or not init.result:
+            raise RuntimeError(f"initialize failed: {init.error}")
+        eprint(f"serverInfo: {init.result.get('serverInfo')}")
+
+        # The transports reject JSON-RPC batch arrays (both cursor_stdio and
+        # handle_jsonrpc require a single object), so pipeline instead: queue
+        # the initialized notification plus both list requests in one flush
+        # and let the reader dispatch the replies by id. tools/call needs a
+        # live Odoo instance, so prompts/list is the second in-flight request.
+        tools_fut = expect(2, _TOOLS_DECODER)
+        prompts_fut = expect(3, _DECODER)
+        send_raw(
+            _INITIALIZED_BYTES + b"\n" + _TOOLS_LIST_BYTES + b"\n" + _PROMPTS_LIST_BYTES
+        )
+        await p.stdin.drain()
+        deadline = deadline_ns()
+        tools = await wait_reply(tools_fut, deadline)
+        prompts = await wait_reply(prompts_fut, deadline)
+        if tools.error:
+            raise RuntimeError(f"tools/list failed: {tools.error}")
+        if prompts.error:
+            raise RuntimeError(f"prompts/list failed: {prompts.error}")
+        tool_names = [t.name for t in tools.result.tools] if tools.result else []
+        eprint(f"prompts: {len((prompts.result or {}).get('prompts', []))}")
+
+        send_raw(_SHUTDOWN_BYTES + b"\n" + _EXIT_BYTES)
+        await p.stdin.drain()
+        return tool_names
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        reader_task.cancel()
+        p.kill()
+        # Diagnostics only cost something when they can help: the success
+        # path skips the stderr drain entirely unless explicitly asked for.
+        if failed or os.environ.get("MCP_TEST_VERBOSE"):
+            # One bounded read grabs whatever stderr is already buffered;
+            # communicate() would gather both streams through helper tasks
+            # just to produce the same tail.
+            try:
+                err = await asyncio.wait_for(p.stderr.read(1 << 20), timeout=0.2)
+            except asyncio.TimeoutError:
+                err = b""
+            if err and err.strip():
+                eprint("--- server stderr (tail) ---")
+                eprint(err.decode("utf-8", "replace").strip()[-2000:])
+        await p.wait()
+
+
+def _prewarm(url: str) -> None:
+    """Resolve DNS and open a throwaway connection to the endpoint.
+
+    Runs in a daemon thread while the event loop spins up, so the real
+    initialize POST finds the OS resolver cache (and any TLS session cache)
+    warm instead of paying those round-trips cold. Errors are irrelevant —
+    the real request will report them properly.
+    """
+    try:
+        httpx.head(url, timeout=2)
+    except Exception:
+        pass
+
+
+async def http_roundtrip(url: str) -> list:
+    """Handshake against a running Streamable HTTP server; return tool names.
+
+    Uses one httpx.AsyncClient with HTTP/2 enabled so every POST is
+    multiplexed over a single connection (hop-by-hop keep-alive headers are
+    the client's job now). The server gates tools/list on the session's
+    initialized flag, so the notification is awaited before tools/list
+    rather than dispatched concurrently.
+    """
+    async with httpx.AsyncClient(http2=True, timeout=10) as client:
+        # Built once and reused for every POST; the session id is added after
+        # initialize instead of rebuilding (and re-hashing) the dict per call.
+        request_headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json, text/event-stream",
+        }
+        status, headers, body = await http_post(
+            client, url, None, request_headers, data=_INIT_BYTES
+        )
+        if status != 200:
+            detail = body[:500].decode("utf-8", "replace")
+            raise RuntimeError(f"initialize returned HTTP {status}: {detail}")
+        init = _DECODER.decode(body)
+        if init.error or not init.result:
+            raise RuntimeError(f"initialize failed: {init.error}")
+        sess = headers.get("mcp-session-id")
+        eprint(f"serverInfo: {init.result.get('serverInfo')} session: {sess}")
+        if sess:
+            request_headers["Mcp-Session-Id"] = sess
+
+        status, _, body = await http_post(
+            client, url, None, request_headers, data=_INITIALIZED_BYTES
+        )
+        if status not in (200, 202):
+            detail = body[:500].decode("utf-8", "replace")
+            raise RuntimeError(f"initialized returned HTTP {status}: {detail}")
+
+        status, _, body = await http_post(
+            client, url, None, request_headers, data=_TOOLS_LIST_BYTES
+        )
+        if status != 200:
+            detail = body[:500].decode("utf-8", "replace")
+            raise RuntimeError(f"tools/list returned HTTP {status}: {detail}")
+        tools = _TOOLS_DECODER.decode(body)
+        if tools.error:
+            raise RuntimeError(f"tools/list failed: {tools.error}")
+        return [t.name for t in tools.result.tools] if tools.result else []
+
+
+@functools.lru_cache(maxsize=1)
+def _get_parser() -> argparse.ArgumentParser:
+    # Built lazily and cached: repeated main() calls (CI loops, embedding)
+    # skip re-creating the parser and its subcommand help text.
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    p_stdio = sub.add_parser("stdio", help="spawn the binary with --transport stdio")
+    p_stdio.add_argument("bin", help="path to the rust-mcp binary")
+    p_stdio.add_argument("--env-file", help="dotenv file merged into the server env")
+    p_stdio.add_argument("--timeout", type=float, default=15.0)
+
+    p_http = sub.add_parser("http", help="talk to a running server over HTTP")
+    p_http.add_argument("--url", default="http://127.0.0.1:8787/mcp")
+    return parser
+
+
+def main() -> int:
+    args = _get_parser().parse_args()
+
+    if args.mode == "stdio":
+        tool_names = asyncio.run(stdio_roundtrip(args.bin, args.env_file, args.timeout))
+    else:
+        threading.Thread(target=_prewarm, args=(args.url,), daemon=True).start()
+        tool_names = asyncio.run(http_roundtrip(args.url))
+
+    if not tool_names:
+        eprint("FAIL: server advertised no tools")
+        return 1
+    print(f"OK: {len(tool_names)} tools: {', '.join(sorted(tool_names))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())